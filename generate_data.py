@@ -1,6 +1,6 @@
 """
   generate_data.py      :   This file contains the Knapsack class for creating random weight-value vectors and
-                            writing it to json files.
+                            writing it to json or npz files.
   File created by       :   Shashank Goyal
   Last commit done by   :   Shashank Goyal
   Last commit date      :   30th October 2020
@@ -8,9 +8,6 @@
 
 # json module used to store and load the knapsack objects in json files
 import json
-# choice method to select an objects from a list of objects
-from random import choice
-
 # numpy module for dot product, cumulative sum, random integer generation
 import numpy as np
 
@@ -26,13 +23,17 @@ class Knapsack:
 
     """
 
-    def __init__(self, n: int, upper_seed: int = 51, json_fname: str = None):
+    def __init__(self, n: int, upper_seed: int = 51, json_fname: str = None, npz_fname: str = None,
+                 random_seed: int = None):
         """Initialization for Class.
 
         Args:
             n           : number of items in the knapsack.
             upper_seed  : used as the upper limit on the range while generating the values.
-            json_fname  : name of the file to load the knapsack object from.
+            json_fname  : name of the json file to load the knapsack object from.
+            npz_fname   : name of the npz file to load the knapsack object from.
+            random_seed : seed of the random number generator, drawn from the global numpy
+                          random state if not specified so that `np.random.seed` reproduces it.
 
         """
 
@@ -45,21 +46,38 @@ class Knapsack:
             # end function
             return
 
+        # if npz file name is specified
+        if npz_fname is not None:
+            # open the npz file
+            with np.load(npz_fname) as npz_file:
+                # number of items
+                self.n = int(npz_file['n'])
+                # weights and values vectors as numpy arrays
+                self.weights = npz_file['weights']
+                self.values = npz_file['values']
+                # capacity of the knapsack
+                self.capacity = int(npz_file['capacity'])
+            # end function
+            return
+
+        # random number generator, seeded from the global numpy random state if no seed is specified
+        if random_seed is None:
+            random_seed = np.random.randint(2 ** 31)
+        rng = np.random.default_rng(random_seed)
         # number of items
         self.n = n
         # take cumulative sum of an array of random integers to make it strictly increasing
-        self.values = np.cumsum(np.random.randint(low=1, high=upper_seed, size=n))
+        values = np.cumsum(rng.integers(low=1, high=upper_seed, size=n))
         # take cumulative sum of an array proportional to the value vector and round off as integers
-        self.weights = (np.cumsum(np.multiply(self.values, np.random.rand(n, )))).astype(np.int)
-        # add weights vector to the values vector inorder to make value vector greater than weights vector
-        self.values += self.weights
+        weights = np.cumsum(values * rng.random(n)).astype(np.int64)
         # capacity is chosen as three times the weight of one of top 10 percent of the weight vectors
-        self.capacity = int(3 * choice(self.weights[int(-0.1 * n):]))
+        self.capacity = int(3 * rng.choice(weights[int(-0.1 * n):]))
 
-        # convert values vector to list
-        self.values = self.values.tolist()
+        # add weights vector to the values vector inorder to make value vector greater than weights vector
+        # and convert it to list
+        self.values = (values + weights).tolist()
         # convert weights vector to list
-        self.weights = self.weights.tolist()
+        self.weights = weights.tolist()
 
     def __repr__(self):
         """Implementation of `repr` dunder method.
@@ -73,11 +91,20 @@ class Knapsack:
                                                                                        self.values)
         return string
 
+    def save_npz(self, npz_fname: str):
+        """Stores the knapsack object in a binary npz file.
+
+        Args:
+            npz_fname   : name of the file to store the knapsack object in.
+        """
+        np.savez(npz_fname, n=self.n, weights=np.asarray(self.weights, dtype=np.int64),
+                 values=np.asarray(self.values, dtype=np.int64), capacity=self.capacity)
+
     def to_numpy(self):
-        """Converts the weights and values vector back to numpy arrays.
+        """Converts the weights and values vector back to contiguous int64 numpy arrays.
         """
-        self.weights = np.array(self.weights, dtype=np.int)
-        self.values = np.array(self.values, dtype=np.int)
+        self.weights = np.ascontiguousarray(self.weights, dtype=np.int64)
+        self.values = np.ascontiguousarray(self.values, dtype=np.int64)
 
 
 if __name__ == "__main__":
@@ -85,8 +112,9 @@ if __name__ == "__main__":
     no_of_items = 10
     # upper seed
     seed = 51
-    # path to save the file
+    # path to save the json file read by the genetic algorithms, and to save the npz file next to it
     fname = './values/' + str(no_of_items) + '_values.json'
+    npz_fname = './values/' + str(no_of_items) + '_values.npz'
 
     # knapsack object
     k = Knapsack(no_of_items, seed)
@@ -97,10 +125,14 @@ if __name__ == "__main__":
     with open(fname, 'w') as file:
         # store the contents of the object in the file
         json.dump(k.__dict__, file)
+    # store the contents of the object in the npz file as well
+    k.save_npz(npz_fname)
 
     # ========================== Sanity Check ========================== 
-    # load a new object with the contents of the file just created
+    # load new objects with the contents of the files just created
     k_load = Knapsack(no_of_items, json_fname=fname)
-    # display the contents of this loaded knapsack object
+    k_load_npz = Knapsack(no_of_items, npz_fname=npz_fname)
+    # display the contents of these loaded knapsack objects
     print(k_load)
+    print(k_load_npz)
     print("Sanity Check Complete")
@@ -5,26 +5,51 @@
   Last commit date            :   30th October 2020
 """
 
-# ThreadPoolExecutor and as_completed to run routines in parallel and get the result when it completes
-from concurrent.futures import ThreadPoolExecutor, as_completed
+# ProcessPoolExecutor to run routines in parallel
+from concurrent.futures import ProcessPoolExecutor
+# partial method to create picklable fitness, encode and decode functions
+from functools import partial
+# get_context to create the worker processes from a fork server
+from multiprocessing import get_context
+# SharedMemory to share the island populations with the worker processes
+from multiprocessing.shared_memory import SharedMemory
 import pickle 
 import time
+# weakref module to free the worker processes of a collected genetic algorithm object
+import weakref
 """
-Note: 	Here, the ThreadPoolExecutor is used and not ProcessPoolExecutor because 
-        we can not use any objects that is not picklable and using the later
-        results in pickling error.
+Note: 	Here, the ProcessPoolExecutor uses the forkserver context and not fork because
+        the workers forked from a process that has already started Numba's parallel
+        threading layer may hang. The genetic algorithm object is pickled only once
+        per worker, so it must be created with picklable functions and not lambdas.
+        The island populations are exchanged through shared memory and are never pickled.
+        The pool is started once per genetic algorithm object and reused by every driver
+        call until `close` is called, the object is collected or the interpreter exits,
+        and only when the islands are large enough to pay for the inter-process
+        communication; otherwise they are evolved in-process.
 """
 
 # numpy module for using genetic operations
 import numpy as np
+# njit decorator and prange to compile the fitness routines to machine code
+from numba import njit, prange
 # tqdm module for progress bar
 from tqdm import tqdm
 
+# cupy module to evaluate the fitness on the GPU, if it is installed
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
+
 # import knapsack object
 from generate_data import Knapsack
 # import the GeneticAlgorithm class to be inherited
 from standard_genetic_algorithm import GeneticAlgorithm
 
+# fitness assigned to the genomes whose load does not fit in the capacity, lower than any profit
+INFEASIBLE_FITNESS = -1
+
 
 def get_genome_sequence(code: int, padding: int):
     """
@@ -48,7 +73,10 @@ def get_genome_sequence(code: int, padding: int):
     Returns:
         np.ndarray  : Array containing 0s and 1s representing base-2 of the `code`.
     """
-    return np.array([int(x) for x in np.binary_repr(code, padding)])
+    # view the code as the bytes of a big-endian unsigned integer
+    code_bytes = np.array([code], dtype='>u8').view(np.uint8)
+    # unpack the bytes into bits and keep the last `padding` bits (or all significant bits)
+    return np.unpackbits(code_bytes)[-max(padding, int(code).bit_length(), 1):].astype(np.int64)
 
 
 def get_genome_value(genome: np.ndarray):
@@ -72,7 +100,78 @@ def get_genome_value(genome: np.ndarray):
     Returns:
         int : Base-10 value of the `genome` array.
     """
-    return int('0b' + ''.join([str(i) for i in genome.tolist()]), 2)
+    # left pad the genome with zeros to a whole number of bytes
+    bits = np.concatenate([np.zeros((-len(genome)) % 8, dtype=np.uint8), np.asarray(genome, dtype=np.uint8)])
+    # pack the bits into bytes and read them as a big-endian integer
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+@njit(cache=True)
+def _decode_nb(code: int, n: int):
+    """
+    Compiled version of `get_genome_sequence` for a fixed length `n`.
+
+    Args:
+        code (int)  : It is the base-10 number to be converted.
+        n (int)     : It is the length of the array representation.
+
+    Returns:
+        np.ndarray  : Array containing 0s and 1s representing base-2 of the `code`.
+    """
+    # initialize the genome sequence
+    genome = np.empty(n, np.int8)
+    # iterate through the bits starting from the most significant one
+    for i in range(n):
+        genome[i] = (code >> (n - 1 - i)) & 1
+    # return genome sequence
+    return genome
+
+
+@njit(cache=True)
+def _fitness_nb(code: int, n: int, weights: np.ndarray, values: np.ndarray, capacity: int):
+    """
+    Compiled fitness of a genome, reading its bits directly from the genome value.
+
+    Args:
+        code (int)              : It is the base-10 genome value.
+        n (int)                 : It is the number of items in the knapsack.
+        weights (np.ndarray)    : It is the integer weights vector.
+        values (np.ndarray)     : It is the integer values vector.
+        capacity (int)          : It is the capacity of the knapsack.
+
+    Returns:
+        int : Total profit value, if the weight load can be taken else `INFEASIBLE_FITNESS`.
+    """
+    # total load and profit of the genome
+    w = 0
+    v = 0
+    # iterate through the bits starting from the most significant one
+    for i in range(n):
+        bit = (code >> (n - 1 - i)) & 1
+        w += bit * weights[i]
+        v += bit * values[i]
+    # return the profit if the load fits in the capacity
+    return v if w <= capacity else INFEASIBLE_FITNESS
+
+
+def _as_arrays(knapsack_obj: Knapsack):
+    """
+    This method converts the vectors of a knapsack object to contiguous int64 arrays
+    with `to_numpy` unless they already are, so that they are converted only once and
+    never passed to the compiled routines as lists.
+
+    Args:
+        knapsack_obj (Knapsack)  : It is the object containing the vectors for the problem.
+
+    Returns:
+        Knapsack : The same object, with its vectors as int64 arrays.
+    """
+    # convert the vectors if any of them is not an int64 array yet
+    if not all(isinstance(vector, np.ndarray) and vector.dtype == np.int64 and vector.flags.c_contiguous
+               for vector in (knapsack_obj.weights, knapsack_obj.values)):
+        knapsack_obj.to_numpy()
+    # return the object
+    return knapsack_obj
 
 
 def fitness_func(code: int, knapsack_obj: Knapsack):
@@ -82,19 +181,370 @@ def fitness_func(code: int, knapsack_obj: Knapsack):
 
     Args:
         code (int)               : It is the base-10 genome value.
-        knapsack_obj (Knapsack)  : It is the object containing the vectors for the problem.
+        knapsack_obj (Knapsack)  : It is the object containing the vectors for the problem,
+                                   converted to int64 arrays on the first call if needed.
+
+    Returns:
+        int : Total profit value, if the weight load can be taken else `INFEASIBLE_FITNESS`.
+    """
+    # make sure the vectors are int64 arrays
+    knapsack_obj = _as_arrays(knapsack_obj)
+    return _fitness_nb(code, knapsack_obj.n, knapsack_obj.weights, knapsack_obj.values, knapsack_obj.capacity)
+
+
+@njit(parallel=True, cache=True)
+def _batch_fitness_nb(codes: np.ndarray, n: int, weights: np.ndarray, values: np.ndarray, capacity: int):
+    """
+    Compiled fitness of a whole population, evaluating the genomes in parallel.
+
+    The bits are consumed in registers without building the genome sequence,
+    and the bit loop is unrolled in blocks of eight so LLVM can vectorize it.
+
+    Args:
+        codes (np.ndarray)      : It is the array of base-10 genome values.
+        n (int)                 : It is the number of items in the knapsack.
+        weights (np.ndarray)    : It is the integer weights vector.
+        values (np.ndarray)     : It is the integer values vector.
+        capacity (int)          : It is the capacity of the knapsack.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray] : Total profit values and whether the load of each genome fits in the capacity.
+    """
+    # initialize the profit array
+    profits = np.empty(codes.shape[0], np.int64)
+    # initialize the feasibility mask
+    feasible = np.empty(codes.shape[0], np.bool_)
+    # iterate through the genomes in parallel
+    for p in prange(codes.shape[0]):
+        # total load and profit of the genome
+        w = 0
+        v = 0
+        c = codes[p]
+        # iterate through the bits eight at a time starting from the most significant one
+        for i in range(0, n - n % 8, 8):
+            # shift of the first bit of this block
+            s = n - 1 - i
+            b0 = (c >> s) & 1
+            b1 = (c >> (s - 1)) & 1
+            b2 = (c >> (s - 2)) & 1
+            b3 = (c >> (s - 3)) & 1
+            b4 = (c >> (s - 4)) & 1
+            b5 = (c >> (s - 5)) & 1
+            b6 = (c >> (s - 6)) & 1
+            b7 = (c >> (s - 7)) & 1
+            w += (b0 * weights[i] + b1 * weights[i + 1] + b2 * weights[i + 2] + b3 * weights[i + 3] +
+                  b4 * weights[i + 4] + b5 * weights[i + 5] + b6 * weights[i + 6] + b7 * weights[i + 7])
+            v += (b0 * values[i] + b1 * values[i + 1] + b2 * values[i + 2] + b3 * values[i + 3] +
+                  b4 * values[i + 4] + b5 * values[i + 5] + b6 * values[i + 6] + b7 * values[i + 7])
+        # iterate through the remaining bits
+        for i in range(n - n % 8, n):
+            bit = (c >> (n - 1 - i)) & 1
+            w += bit * weights[i]
+            v += bit * values[i]
+        # store the profit and whether the load fits in the capacity
+        profits[p] = v
+        feasible[p] = w <= capacity
+    # return profit array and feasibility mask
+    return profits, feasible
+
+
+def batch_fitness(codes: np.ndarray, knapsack_obj: Knapsack):
+    """
+    This method calculates the fitness of a whole population at once.
+
+    Args:
+        codes (np.ndarray)       : It is the array of base-10 genome values.
+        knapsack_obj (Knapsack)  : It is the object containing the vectors for the problem,
+                                   converted to int64 arrays on the first call if needed.
+
+    Returns:
+        np.ndarray : Total profit values, with `INFEASIBLE_FITNESS` for genomes exceeding the capacity.
+    """
+    # make sure the vectors are int64 arrays
+    knapsack_obj = _as_arrays(knapsack_obj)
+    # profits and feasibility mask of the genomes
+    profits, feasible = _batch_fitness_nb(np.asarray(codes), knapsack_obj.n,
+                                          knapsack_obj.weights, knapsack_obj.values, knapsack_obj.capacity)
+    # keep the profit of the feasible genomes only
+    return np.where(feasible, profits, INFEASIBLE_FITNESS)
+
+
+# kernels compiled in this process by `SpecializedBatchFitness`, keyed by the knapsack they are generated for
+_specialized_kernels = {}
+
+
+class SpecializedBatchFitness:
+    """Class to calculate the fitness of a population with a kernel generated for one knapsack.
+
+    The source of the kernel is generated at runtime with the vectors and the capacity of
+    the knapsack written in as constants and the loop over the items fully unrolled, so the
+    compiler can fold every bit test with its weight and value. The kernel is compiled at
+    most once per process for each knapsack, however many objects are unpickled there.
+
+    Attributes:
+        knapsack_obj (Knapsack) : object containing the vectors for the problem.
+
+    """
+
+    def __init__(self, knapsack_obj: Knapsack):
+        """Initialization for Class.
+
+        Args:
+            knapsack_obj    : object containing the vectors for the problem.
+
+        """
+        # knapsack the kernel is generated for, with its vectors as int64 arrays
+        self.knapsack_obj = _as_arrays(knapsack_obj)
+        # key of the kernel in the compiled kernels of the process
+        self._key = (knapsack_obj.n, tuple(int(w) for w in knapsack_obj.weights),
+                     tuple(int(v) for v in knapsack_obj.values), int(knapsack_obj.capacity))
+        # compiled kernel, looked up or generated on the first call
+        self._kernel = None
+
+    def __getstate__(self):
+        """Implementation of `getstate` dunder method.
+
+        The compiled kernel is not picklable, so it is dropped and looked up again after unpickling.
+
+        Returns:
+            dict : Attributes of the object without the compiled kernel.
+        """
+        state = self.__dict__.copy()
+        state['_kernel'] = None
+        return state
+
+    def __call__(self, codes: np.ndarray):
+        """Implementation of `call` dunder method.
+
+        Args:
+            codes   : array of base-10 genome values.
+
+        Returns:
+            np.ndarray : Total profit values, with `INFEASIBLE_FITNESS` for genomes exceeding the capacity.
+        """
+        # on the first call, look up the kernel compiled in this process for the knapsack
+        if self._kernel is None:
+            # generate it if no object compiled it yet
+            if self._key not in _specialized_kernels:
+                _specialized_kernels[self._key] = self.generate_kernel()
+            self._kernel = _specialized_kernels[self._key]
+        # return fitness array
+        return self._kernel(np.asarray(codes))
+
+    def generate_kernel(self):
+        """Generates and compiles the batch fitness kernel for the knapsack.
+
+        Returns:
+            Callable : compiled function returning the fitness of an array of genome values.
+        """
+        # unpack the knapsack
+        n, capacity = self.knapsack_obj.n, int(self.knapsack_obj.capacity)
+        weights, values = self.knapsack_obj.weights, self.knapsack_obj.values
+        # source of the fitness of one genome, with one bit test for each item
+        source = ["def fitness(c):", "    w = 0", "    v = 0"]
+        for i in range(n):
+            source += ["    if c & {}:".format(1 << (n - 1 - i)),
+                       "        w += {}".format(int(weights[i])),
+                       "        v += {}".format(int(values[i]))]
+        source += ["    return v if w <= {} else {}".format(capacity, INFEASIBLE_FITNESS)]
+        # execute the source to define the function
+        namespace = {}
+        exec("\n".join(source), namespace)
+        # compile the fitness of one genome
+        fitness = njit(namespace['fitness'])
+
+        @njit
+        def kernel(codes):
+            # initialize the fitness array
+            fitness_arr = np.empty(codes.shape[0], np.int64)
+            # iterate through the genomes serially, small islands being too small to pay for threads
+            # and large ones being already evaluated in the worker processes
+            for p in range(codes.shape[0]):
+                fitness_arr[p] = fitness(codes[p])
+            # return fitness array
+            return fitness_arr
+
+        # return the compiled kernel
+        return kernel
+
+
+class GPUBatchFitness:
+    """Class to calculate the fitness of a population on the GPU with CuPy.
+
+    The vectors of the knapsack are copied to the GPU once as the two columns of a
+    matrix, and each population is decoded in place into a bit matrix kept on the GPU
+    across the generations, which is then multiplied with it. Populations with
+    fewer than `GPU_THRESHOLD` bits are evaluated on the CPU with `batch_fitness`,
+    as copying them to the GPU costs more than evaluating them.
+
+    It has not been run on a GPU yet, so it is only used when passed explicitly
+    as the batch fitness function.
+
+    Class Attributes:
+        GPU_THRESHOLD (int)     : minimum number of bits (population size times `n`) evaluated on the GPU.
+
+    Instance Attributes:
+        knapsack_obj (Knapsack) : object containing the vectors for the problem.
+
+    """
+    GPU_THRESHOLD = 10 ** 5
+
+    def __init__(self, knapsack_obj: Knapsack):
+        """Initialization for Class.
+
+        Args:
+            knapsack_obj    : object containing the vectors for the problem.
+
+        """
+        # check that cupy is installed
+        if cp is None:
+            raise ImportError("CuPy is required to evaluate the fitness on the GPU.")
+        # knapsack the fitness is calculated for, with its vectors as int64 arrays
+        self.knapsack_obj = _as_arrays(knapsack_obj)
+        # weights and values vectors stacked as columns on the GPU, copied on the first GPU evaluation
+        self._vectors_d = None
+        # shift of the bit of each item, starting from the most significant one
+        self._shifts_d = None
+        # bit matrix buffer on the GPU, grown to the largest population evaluated
+        self._bits_d = None
+
+    def __getstate__(self):
+        """Implementation of `getstate` dunder method.
+
+        The arrays on the GPU are dropped and created again by the process unpickling the object.
+
+        Returns:
+            dict : Attributes of the object without the arrays on the GPU.
+        """
+        state = self.__dict__.copy()
+        state['_vectors_d'] = None
+        state['_shifts_d'] = None
+        state['_bits_d'] = None
+        return state
+
+    def __call__(self, codes: np.ndarray):
+        """Implementation of `call` dunder method.
+
+        Args:
+            codes   : array of base-10 genome values.
+
+        Returns:
+            np.ndarray : Total profit values, with `INFEASIBLE_FITNESS` for genomes exceeding the capacity.
+        """
+        # convert to array
+        codes = np.asarray(codes)
+        # evaluate small populations on the CPU
+        if len(codes) * self.knapsack_obj.n < self.GPU_THRESHOLD:
+            return batch_fitness(codes, self.knapsack_obj)
+        # copy the vectors to the GPU on the first GPU evaluation
+        if self._vectors_d is None:
+            self._vectors_d = cp.asarray(np.stack([self.knapsack_obj.weights, self.knapsack_obj.values], axis=1),
+                                         dtype=cp.int64)
+            self._shifts_d = cp.arange(self.knapsack_obj.n - 1, -1, -1, dtype=cp.int64)
+        # grow the bit matrix buffer if the population does not fit in it
+        if self._bits_d is None or len(self._bits_d) < len(codes):
+            self._bits_d = cp.empty((len(codes), self.knapsack_obj.n), dtype=cp.int64)
+        # rows of the buffer used by this population
+        bits = self._bits_d[:len(codes)]
+        # copy the codes to the GPU
+        codes_d = cp.asarray(codes, dtype=cp.int64)
+        # decode the codes into the buffer, one row of bits per genome
+        cp.right_shift(codes_d[:, None], self._shifts_d, out=bits)
+        cp.bitwise_and(bits, 1, out=bits)
+        # total load and profit of every genome in a single product of same dtype operands
+        weights, values = (bits @ self._vectors_d).T
+        # mask the genomes whose load does not fit in the capacity and copy the result back
+        return cp.asnumpy(cp.where(weights <= self.knapsack_obj.capacity, values, INFEASIBLE_FITNESS))
+
+
+def unique_population(population: np.ndarray):
+    """
+    This method removes the repeated genomes of a population using a set,
+    which is faster than the sort done by `np.unique` for small populations.
+
+    Args:
+        population (np.ndarray) : It is the input population.
 
     Returns:
-        int : Total profit value, if the weight load can be taken else `np.NINF`.
+        np.ndarray  : Array containing the distinct genome values in no particular order.
     """
-    # get genome sequence
-    genome = get_genome_sequence(code, knapsack_obj.n)
-    # check if total load of genome fits in capacity
-    if np.dot(genome, knapsack_obj.weights) <= knapsack_obj.capacity:
-        # return the profit
-        return np.dot(genome, knapsack_obj.values)
-    # return Negative Infinity 
-    return np.NINF
+    # set of distinct genome values
+    genomes = set(population.tolist())
+    # return as an array of the same data type
+    return np.fromiter(genomes, dtype=population.dtype, count=len(genomes))
+
+
+# genetic algorithm object of a worker process
+_worker_ga = None
+# shared memory block of the island populations and its array view in a worker process
+_worker_shm = None
+_worker_islands = None
+
+
+def _init_worker(ga_state: bytes, shm_name: str, shape: tuple):
+    """
+    This method initializes a worker process with the genetic algorithm object, attaches
+    the shared memory of the islands and reseeds its random generator, which is
+    otherwise copied from the fork server.
+
+    Args:
+        ga_state (bytes)    : It is the pickled genetic algorithm object used by the worker.
+        shm_name (str)      : It is the name of the shared memory block of the islands.
+        shape (tuple)       : It is the shape of the array of the islands, one row per island.
+    """
+    global _worker_ga, _worker_shm, _worker_islands
+    # unpickle and store the genetic algorithm object
+    _worker_ga = ga = pickle.loads(ga_state)
+    # attach the shared memory block and view it as an array
+    _worker_shm = SharedMemory(name=shm_name)
+    _worker_islands = np.ndarray(shape, dtype=ga.population_dtype, buffer=_worker_shm.buf)
+    # reseed the numpy random generator
+    np.random.seed()
+
+
+def _stop_workers(executor: ProcessPoolExecutor, shm: SharedMemory):
+    """
+    This method shuts down the worker processes of a genetic algorithm object and frees
+    the shared memory block of its islands. It is called by `IslandGeneticAlgorithm.close`
+    or, if that was never called, when the object is collected or the interpreter exits.
+
+    Args:
+        executor (ProcessPoolExecutor)  : It is the pool of worker processes.
+        shm (SharedMemory)              : It is the shared memory block of the islands.
+    """
+    # wait for the workers to exit
+    executor.shutdown()
+    # free the shared memory block
+    shm.unlink()
+    # unmap it, unless an array still views it at interpreter exit
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+
+def _evolve_island(index: int, length: int, generations: int, selection_percentage: float):
+    """
+    This method evolves an island population, stored in the shared memory, in a worker process.
+
+    Args:
+        index (int)                     : It is the index of the island, i.e. its row in the shared memory.
+        length (int)                    : It is the size of the population of the island.
+        generations (int)               : It is the number of generations to evolve the island for.
+        selection_percentage (float)    : It is the percentage of population allowed to move to next step.
+
+    Returns:
+        int : size of the population of the island after the generations.
+    """
+    # copy the population of the island out of the shared memory
+    island = _worker_islands[index, :length].copy()
+    # evolve the island and keep as many individuals as its row can hold
+    island = _worker_ga.keep_fittest(_worker_ga.evolve(island, generations, selection_percentage),
+                                     _worker_islands.shape[1])
+    # write the population of the island back to the shared memory
+    _worker_islands[index, :len(island)] = island
+    # return the size of the population
+    return len(island)
 
 
 class IslandGeneticAlgorithm(GeneticAlgorithm):
@@ -102,8 +552,17 @@ class IslandGeneticAlgorithm(GeneticAlgorithm):
 
     Attributes:
         inherited from super() class
+        batch_fitness_func (Callable)   : function that calculates the fitness of an array of genomes.
+        population_dtype (np.dtype)     : data type of the population arrays, int32 when the genomes fit in it.
+
+    Class Attributes:
+        PARALLEL_THRESHOLD (int)        : minimum number of individuals over all the initial islands
+                                          for the driver to evolve them in worker processes.
+        FIT_CACHE_SIZE (int)            : maximum number of fitness scores cached by `cached_fitness`.
 
     """
+    PARALLEL_THRESHOLD = 10 ** 4
+    FIT_CACHE_SIZE = 2 ** 16
 
     def __init__(self, *args, **kwargs):
         """Initialization for Class.
@@ -117,12 +576,183 @@ class IslandGeneticAlgorithm(GeneticAlgorithm):
         super().__init__(*args, **kwargs)
         # set kwargs as instance attributes.
         super().__dict__.update(kwargs)
+        # store the populations as int32 when every genome of genome_size bits fits in it to halve their size
+        self.population_dtype = np.int32 if self.genome_size <= 31 else np.int64
+        # cache of the fitness scores calculated by the fallback batch fitness, with genome values as keys
+        self._fit_cache = {}
+        # if the batch fitness function is not specified
+        if getattr(self, 'batch_fitness_func', None) is None:
+            # fall back to evaluating the fitness of one genome at a time
+            self.batch_fitness_func = self.fitness_of_each
+        # worker processes and shared memory of the islands, started by the first driver call using them
+        self._executor = None
+        self._shm = None
+        self._shared_islands = None
+        # pickled object the workers were started with, and the finalizer stopping them
+        self._worker_state = None
+        self._finalizer = None
+
+    def __enter__(self):
+        """Implementation of `enter` dunder method.
+
+        Returns:
+            IslandGeneticAlgorithm : the object itself, its workers being stopped on exit.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """Implementation of `exit` dunder method.
+
+        Args:
+            *exc_info   : exception raised in the block, if any.
+        """
+        self.close()
+
+    def __getstate__(self):
+        """Implementation of `getstate` dunder method.
+
+        The worker processes and the shared memory belong to the process that started them,
+        so they are not pickled along with the object sent to the workers, and neither is
+        the fitness cache, which each worker fills on its own.
+
+        Returns:
+            dict : Attributes of the object without the worker processes, the shared memory and the cache.
+        """
+        state = self.__dict__.copy()
+        state['_fit_cache'] = {}
+        state['_executor'] = None
+        state['_shm'] = None
+        state['_shared_islands'] = None
+        state['_worker_state'] = None
+        state['_finalizer'] = None
+        return state
+
+    def start_workers(self, k_parallel: int):
+        """Start the worker processes and the shared memory of the islands.
+
+        Nothing is done if they are already started for `k_parallel` islands with the
+        current attributes, so that they are reused across the driver calls. The workers
+        are restarted if any attribute changed since they were started, as they evolve
+        the islands with a copy of the object.
+
+        Args:
+            k_parallel  : number of islands evolved in parallel.
+        """
+        # pickled object to start the workers with
+        state = pickle.dumps(self)
+        # if the workers are already started for this number of islands and these attributes
+        if (self._executor is not None and self._shared_islands.shape[0] == k_parallel
+                and self._worker_state == state):
+            # reuse them
+            return
+        # stop the workers started for another number of islands or other attributes
+        self.close()
+        # number of individuals each island can hold in the shared memory
+        island_size = 2 * self.init_pop_size
+        # shared memory block holding the island populations, one row per island
+        self._shm = SharedMemory(create=True,
+                                 size=k_parallel * island_size * np.dtype(self.population_dtype).itemsize)
+        self._shared_islands = np.ndarray((k_parallel, island_size), dtype=self.population_dtype,
+                                          buffer=self._shm.buf)
+        # parallelizing using ProcessPoolExecutor
+        self._executor = ProcessPoolExecutor(max_workers=k_parallel, mp_context=get_context('forkserver'),
+                                             initializer=_init_worker,
+                                             initargs=(state, self._shm.name, self._shared_islands.shape))
+        self._worker_state = state
+        # stop the workers when the object is collected or the interpreter exits, if not closed before
+        self._finalizer = weakref.finalize(self, _stop_workers, self._executor, self._shm)
+
+    def close(self):
+        """Shut down the worker processes and free the shared memory of the islands.
+        """
+        # if the workers are started
+        if self._finalizer is not None:
+            # release the array view, then stop the workers and free the shared memory block
+            self._shared_islands = None
+            self._finalizer()
+            self._executor = self._shm = self._worker_state = self._finalizer = None
+
+    def init_population(self):
+        """Initializes a population with unique genomes.
+
+        Returns:
+            np.ndarray  : Array containing genome values of individuals of the population.
+        """
+        return super().init_population().astype(self.population_dtype)
+
+    def cached_fitness(self, code: int):
+        """Calculate the fitness of a genome, reusing the score if it was calculated before.
+
+        At most `FIT_CACHE_SIZE` scores are kept, the oldest one being evicted first.
+
+        Args:
+            code    : genome value.
+
+        Returns:
+            int : fitness score of the genome.
+        """
+        # convert to int to use as the key
+        code = int(code)
+        # if the genome has not been evaluated yet
+        if code not in self._fit_cache:
+            # evict the oldest score if the cache is full
+            if len(self._fit_cache) >= self.FIT_CACHE_SIZE:
+                del self._fit_cache[next(iter(self._fit_cache))]
+            # calculate and store its fitness
+            self._fit_cache[code] = self.fitness_func(code)
+        # return the stored fitness
+        return self._fit_cache[code]
+
+    def fitness_of_each(self, population: np.ndarray):
+        """Calculate the fitness of the population one genome at a time, through the fitness cache.
+
+        Args:
+            population  : input population.
+
+        Returns:
+            np.ndarray  : fitness scores of the population.
+        """
+        return np.array([self.cached_fitness(g) for g in population])
+
+    def fittest(self, population: np.ndarray):
+        """Find the individual with the max fitness score using a single batch fitness evaluation.
+
+        Args:
+            population  : input population.
+
+        Returns:
+            int : genome value of the fittest individual.
+        """
+        return population[np.argmax(self.batch_fitness_func(population))]
+
+    def selection(self, population: np.ndarray, selection_rate: float = 0.5):
+        """Select the top percentage of population based on the fitness score.
+
+        The fitness of the whole population is calculated with a single call
+        to `batch_fitness_func` and the top individuals are found with a partial
+        sort, so they are returned in no particular order.
+
+        Args:
+            population      : input population.
+            selection_rate  : percentage of population allowed to move to next step.
+
+        Returns:
+            nd.ndarray  : top `selection_rate` of the total population with high fitness scores.
+        """
+        # convert to array
+        population = np.asarray(population)
+        # number of individuals to select, at least one
+        k = max(1, int(selection_rate * len(population)))
+        # return the top `selection_rate` of population genomes
+        return population[np.argpartition(self.batch_fitness_func(population), -k)[-k:]]
 
     def crossover_mutation(self, population: np.ndarray):
         """Generate the new generation after crossover and performs mutations.
 
         It is a combination of the `crossover` and `mutation` from the super class
         in order to make it easier to parallelize without too much branching.
+        The super class builds the new generation with default integer arrays,
+        so it is cast back to the population data type.
 
         Args:
             population  : input population.
@@ -134,51 +764,155 @@ class IslandGeneticAlgorithm(GeneticAlgorithm):
         population = self.crossover(population)
         # perform mutation
         population = self.mutation(population)
-        # return the new generation and initial population after removing the repetitions
+        # return the new generation and initial population with the population data type
+        return population.astype(self.population_dtype, copy=False)
+
+    def evolve(self, population: np.ndarray, generations: int, selection_percentage: float):
+        """Evolve a population on its own for a number of generations.
+
+        Args:
+            population              : input population.
+            generations             : number of generations to evolve the population for.
+            selection_percentage    : percentage of population allowed to move to next step.
+
+        Returns:
+            np.ndarray  : population after the generations.
+        """
+        # iterate through the generations
+        for _ in range(generations):
+            # stop if only one element is left in the population
+            if len(population) <= 1:
+                break
+            # sanity precaution
+            if selection_percentage * len(population) <= 1:
+                # only store the individual with the max fitness score
+                population = np.array([self.fittest(population)], dtype=population.dtype)
+                # break loop
+                break
+            # select the top selection_percentage
+            population = self.selection(population, selection_percentage)
+            # perform crossover and mutation
+            population = self.crossover_mutation(population)
+        # return the evolved population
         return population
 
-    def driver(self, selection_percentage: float, k_parallel: int = 5):
+    def keep_fittest(self, population: np.ndarray, size: int):
+        """Keep the fittest individuals of the population if it is larger than a size.
+
+        Args:
+            population  : input population.
+            size        : maximum size of the population.
+
+        Returns:
+            np.ndarray  : population with at most `size` individuals.
+        """
+        # if the population is small enough
+        if len(population) <= size:
+            # return it as it is
+            return population
+        # return the `size` fittest individuals
+        return population[np.argpartition(self.batch_fitness_func(population), -size)[-size:]]
+
+    def migrate(self, islands: list, migration_rate: float):
+        """Copy the fittest individuals of each island to the next island of the ring.
+
+        Args:
+            islands         : list of island populations.
+            migration_rate  : percentage of each island population that migrates.
+
+        Returns:
+            list    : island populations after the migration.
+        """
+        # empty list for the migrants of each island
+        migrants = []
+        # iterate through the islands
+        for island in islands:
+            # number of individuals leaving the island, at least one
+            migrants_count = max(1, int(migration_rate * len(island)))
+            # indices of the fittest individuals of the island
+            fittest = np.argpartition(self.batch_fitness_func(island), -migrants_count)[-migrants_count:]
+            # the fittest individuals of the island
+            migrants.append(island[fittest])
+        # the ith island receives the migrants of the (i-1)th island, the first one those of the last one
+        return [unique_population(np.concatenate((island, migrants[i - 1]))) for i, island in enumerate(islands)]
+
+    def evolve_islands(self, islands: list, generations: int, selection_percentage: float, use_workers: bool):
+        """Evolve each island on its own for a number of generations.
+
+        Args:
+            islands                 : list of island populations.
+            generations             : number of generations to evolve the islands for.
+            selection_percentage    : percentage of population allowed to move to next step.
+            use_workers             : whether to evolve the islands in the worker processes.
+
+        Returns:
+            list    : island populations after the generations.
+        """
+        # if the islands are evolved in this process
+        if not use_workers:
+            # evolve them one after the other
+            return [self.evolve(island, generations, selection_percentage) for island in islands]
+        # number of individuals each island can hold in the shared memory
+        island_size = self._shared_islands.shape[1]
+        # keep as many individuals as a row of the shared memory can hold
+        islands = [self.keep_fittest(island, island_size) for island in islands]
+        # write each island to its row of the shared memory
+        for i, island in enumerate(islands):
+            self._shared_islands[i, :len(island)] = island
+        # evolve each island in a worker process
+        futures = [self._executor.submit(_evolve_island, i, len(island), generations, selection_percentage)
+                   for i, island in enumerate(islands)]
+        # read the evolved islands back in the order of the ring
+        return [self._shared_islands[i, :f.result()].copy() for i, f in enumerate(futures)]
+
+    def driver(self, selection_percentage: float, k_parallel: int = 5,
+               migration_interval: int = 5, migration_rate: float = 0.1, use_workers: bool = None):
         """The driver method for the Island Genetic Algorithm.
 
+        Each of the `k_parallel` islands keeps its own population and evolves it for
+        `migration_interval` generations, after which the fittest individuals of each
+        island migrate to the next island of a ring.
+
         Args:
             selection_percentage	: percentage of population allowed to move to next step.
-            k_parallel    			: number of parallel sub genetic algorithms routines.
+            k_parallel    			: number of islands evolved in parallel.
+            migration_interval      : number of generations between two migrations.
+            migration_rate          : percentage of each island population that migrates.
+            use_workers             : whether to evolve the islands in worker processes, by default
+                                      only if the initial islands hold `PARALLEL_THRESHOLD` individuals.
+                                      The workers are kept running until `close` is called, the
+                                      object is used as a context manager or it is collected.
 
         Returns:
             int : genome value of the winner genome
         """
+        # if not specified, use the workers only if the islands are large enough to pay for the IPC
+        if use_workers is None:
+            use_workers = k_parallel * self.init_pop_size >= self.PARALLEL_THRESHOLD
+        # start the workers, or reuse the ones started by a previous call
+        if use_workers:
+            self.start_workers(k_parallel)
         # empty list for all the winners throughout the cycles
         winner_genomes = []
         # iterate through the cycles
         for _ in tqdm(range(self.cycle), leave=False):
-            # create initial population
-            population = self.init_population()
-            # loop until only one element is left in the population
-            while len(population) > 1:
-                # sanity precaution
-                if selection_percentage * len(population) <= 1:
-                    # only store the individual with the max fitness score
-                    population = [max(population, key=lambda g: self.fitness_func(g))]
-                    # break loop
+            # create initial population for each island
+            islands = [self.init_population() for _ in range(k_parallel)]
+            # loop until only one element is left in each island
+            while True:
+                # evolve each island for migration_interval generations
+                islands = self.evolve_islands(islands, migration_interval, selection_percentage, use_workers)
+                # stop if every island is left with one element
+                if all(len(island) <= 1 for island in islands):
                     break
-                # select the top selection_percentage
-                population = self.selection(population, selection_percentage)
-                # parallelizing using ThreadPoolExecutor
-                with ThreadPoolExecutor() as executor:
-                    # add the driver method along with arguments to k_parallel future instances
-                    futures = [executor.submit(self.crossover_mutation, population) for _ in range(k_parallel)]
-                    # initialize population as empty array
-                    population = np.array([], dtype=int)
-                    # as each sub routine is completed
-                    for f in as_completed(futures):
-                        # stack horizontally over the population
-                        population = np.hstack((population, f.result()))
-                # remove repetitions
-                population = np.unique(population)
+                # migrate the fittest individuals along the ring
+                islands = self.migrate(islands, migration_rate)
+            # join the survivors of all the islands
+            population = np.concatenate(islands)
             # add the winner genome of this cycle to the list
-            winner_genomes.append(population[0])
+            winner_genomes.append(self.fittest(population))
         # choose the winner based on the maximum fitness scores out of the various winners
-        best_genome = max(winner_genomes, key=lambda g: self.fitness_func(g))
+        best_genome = self.fittest(np.array(winner_genomes))
         # return the winner value
         return best_genome
 
@@ -199,16 +933,23 @@ if __name__ == "__main__":
         'init_pop_size': knapsack_object.n ** 2,
         'crossover_scheme': GeneticAlgorithm.UNIFORM_CROSSOVER,
         'mutation_scheme': GeneticAlgorithm.BIT_FLIP_MUTATION,
-        'fitness_func': lambda genome: fitness_func(genome, knapsack_object),
+        'fitness_func': partial(fitness_func, knapsack_obj=knapsack_object),
+        'batch_fitness_func': SpecializedBatchFitness(knapsack_object),
         'seed_range': (0, 2 ** knapsack_object.n - 1),
         'encode': get_genome_value,
-        'decode': lambda genome: get_genome_sequence(genome, knapsack_object.n)
+        'decode': partial(_decode_nb, n=knapsack_object.n)
     }
-
-    # create an object
-    ga = IslandGeneticAlgorithm(**genetic_algo_data)
-    # run the driver method
-    winner_genome = ga.driver(0.05, 10)
+    # GPUBatchFitness(knapsack_object) can be used as the batch fitness function instead,
+    # on a machine with CuPy and a GPU, once it has been run on one
+
+    # create an object, stopping its worker processes, if any were started, at the end of the block
+    with IslandGeneticAlgorithm(**genetic_algo_data) as ga:
+        # compile the fitness and decode routines for the population data type before running the driver
+        fitness_func(0, knapsack_object)
+        ga.batch_fitness_func(np.zeros(1, dtype=ga.population_dtype))
+        _decode_nb(0, knapsack_object.n)
+        # run the driver method
+        winner_genome = ga.driver(0.05, 10)
     # print the results
     print("Sequence: {}\nGenome Value: {}\nProfit: {}\nCapacity Used: {}".format
           (get_genome_sequence(winner_genome, knapsack_object.n),
@@ -7,11 +7,14 @@
 
 # ThreadPoolExecutor and as_completed to run routines in parallel and get the result when it completes
 from concurrent.futures import ThreadPoolExecutor, as_completed
+# partial method to create picklable fitness and decode functions
+from functools import partial
 
 """
-Note: 	Here, the ThreadPoolExecutor is used and not ProcessPoolExecutor because 
-        we can not use any objects that is not picklable and using the later
-        results in pickling error.
+Note: 	Here, the ThreadPoolExecutor runs the sub genetic algorithms, and each of them
+        evolves its islands in-process (`use_workers=False`) so that no process pool
+        is started inside every thread; the islands of the sub genetic algorithms are
+        too small to pay for the inter-process communication anyway.
 """
 
 # numpy module for using genetic operations
@@ -49,7 +52,10 @@ def get_genome_sequence(code: int, padding: int):
     Returns:
         np.ndarray  : Array containing 0s and 1s representing base-2 of the `code`.
     """
-    return np.array([int(x) for x in np.binary_repr(code, padding)])
+    # view the code as the bytes of a big-endian unsigned integer
+    code_bytes = np.array([code], dtype='>u8').view(np.uint8)
+    # unpack the bytes into bits and keep the last `padding` bits (or all significant bits)
+    return np.unpackbits(code_bytes)[-max(padding, int(code).bit_length(), 1):].astype(np.int64)
 
 
 def get_genome_value(genome: np.ndarray):
@@ -73,7 +79,10 @@ def get_genome_value(genome: np.ndarray):
     Returns:
         int : Base-10 value of the `genome` array.
     """
-    return int('0b' + ''.join([str(i) for i in genome.tolist()]), 2)
+    # left pad the genome with zeros to a whole number of bytes
+    bits = np.concatenate([np.zeros((-len(genome)) % 8, dtype=np.uint8), np.asarray(genome, dtype=np.uint8)])
+    # pack the bits into bytes and read them as a big-endian integer
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
 
 
 def fitness_func(code: int, knapsack_obj: Knapsack):
@@ -86,7 +95,7 @@ def fitness_func(code: int, knapsack_obj: Knapsack):
         knapsack_obj (Knapsack)  : It is the object containing the vectors for the problem.
 
     Returns:
-        int : Total profit value, if the weight load can be taken else `np.NINF`.
+        int : Total profit value, if the weight load can be taken else -1.
     """
     # get genome sequence
     genome = get_genome_sequence(code, knapsack_obj.n)
@@ -94,8 +103,8 @@ def fitness_func(code: int, knapsack_obj: Knapsack):
     if np.dot(genome, knapsack_obj.weights) <= knapsack_obj.capacity:
         # return the profit
         return np.dot(genome, knapsack_obj.values)
-    # return Negative Infinity 
-    return np.NINF
+    # return -1, lower than the profit of any feasible genome
+    return -1
 
 
 class ModifiedGeneticAlgorithm:
@@ -138,24 +147,20 @@ class ModifiedGeneticAlgorithm:
         Returns:
             np.ndarray : population containing local optimums for each interval
         """
-        # iterate through the cycles
-        for i in range(self.cycle):
-            # parallelizing using ThreadPoolExecutor
-            with ThreadPoolExecutor() as executor:
+        # parallelizing using ThreadPoolExecutor, created once for all the cycles
+        with ThreadPoolExecutor(max_workers=self.m_parallel) as executor:
+            # iterate through the cycles
+            for i in range(self.cycle):
                 # add the driver method along with arguments from GA_list to future instances
-                futures = [executor.submit(GA.driver, 0.05, 10) for GA in self.GA_list]
-                # initialize superior_population as empty array
-                superior_population = np.array([], dtype=int)
-                # as each sub routine is completed
-                for f in as_completed(futures):
-                    # stack horizontally over the population
-                    superior_population = np.hstack((superior_population, f.result()))
-                # remove repetitions
-                superior_population = np.unique(superior_population)
-            # yield this superior_population
-            yield superior_population
-            # print Cycle Completed message
-            print(" Completed Cycle: {}".format(i + 1))
+                futures = [executor.submit(GA.driver, 0.05, 10, use_workers=False) for GA in self.GA_list]
+                # collect the winner of each sub routine as it is completed
+                results = [f.result() for f in as_completed(futures)]
+                # join the winners and remove repetitions
+                superior_population = np.unique(np.array(results))
+                # yield this superior_population
+                yield superior_population
+                # print Cycle Completed message
+                print(" Completed Cycle: {}".format(i + 1))
 
     def driver(self, threshold_vector: np.ndarray, threshold_value: float, restart_rate: float = 0.995):
         """The driver method for the RestartBase Genetic Algorithm.
@@ -220,10 +225,10 @@ if __name__ == "__main__":
         'init_pop_size': (knapsack_object.n ** 2) // m_parallel_threads,
         'crossover_scheme': GeneticAlgorithm.UNIFORM_CROSSOVER,
         'mutation_scheme': GeneticAlgorithm.BIT_FLIP_MUTATION,
-        'fitness_func': lambda genome: fitness_func(genome, knapsack_object),
+        'fitness_func': partial(fitness_func, knapsack_obj=knapsack_object),
         'seed_range': (0, 2 ** knapsack_object.n - 1),
         'encode': get_genome_value,
-        'decode': lambda genome: get_genome_sequence(genome, knapsack_object.n)
+        'decode': partial(get_genome_sequence, padding=knapsack_object.n)
     }
 
     # values for the outer genetic algorithm instance
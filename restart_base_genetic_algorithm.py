@@ -38,7 +38,10 @@ def get_genome_sequence(code: int, padding: int):
     Returns:
         np.ndarray  : Array containing 0s and 1s representing base-2 of the `code`.
     """
-    return np.array([int(x) for x in np.binary_repr(code, padding)])
+    # view the code as the bytes of a big-endian unsigned integer
+    code_bytes = np.array([code], dtype='>u8').view(np.uint8)
+    # unpack the bytes into bits and keep the last `padding` bits (or all significant bits)
+    return np.unpackbits(code_bytes)[-max(padding, int(code).bit_length(), 1):].astype(np.int64)
 
 
 def get_genome_value(genome: np.ndarray):
@@ -62,7 +65,10 @@ def get_genome_value(genome: np.ndarray):
     Returns:
         int : Base-10 value of the `genome` array.
     """
-    return int('0b' + ''.join([str(i) for i in genome.tolist()]), 2)
+    # left pad the genome with zeros to a whole number of bytes
+    bits = np.concatenate([np.zeros((-len(genome)) % 8, dtype=np.uint8), np.asarray(genome, dtype=np.uint8)])
+    # pack the bits into bytes and read them as a big-endian integer
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
 
 
 def fitness_func(code: int, knapsack_obj: Knapsack):
@@ -75,7 +81,7 @@ def fitness_func(code: int, knapsack_obj: Knapsack):
         knapsack_obj (Knapsack)  : It is the object containing the vectors for the problem.
 
     Returns:
-        int : Total profit value, if the weight load can be taken else `np.NINF`.
+        int : Total profit value, if the weight load can be taken else -1.
     """
     # get genome sequence
     genome = get_genome_sequence(code, knapsack_obj.n)
@@ -83,8 +89,8 @@ def fitness_func(code: int, knapsack_obj: Knapsack):
     if np.dot(genome, knapsack_obj.weights) <= knapsack_obj.capacity:
         # return the profit
         return np.dot(genome, knapsack_obj.values)
-    # return Negative Infinity 
-    return np.NINF
+    # return -1, lower than the profit of any feasible genome
+    return -1
 
 
 class RestartBaseGeneticAlgorithm(GeneticAlgorithm):